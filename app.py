@@ -1,20 +1,53 @@
 import os
 import uuid
 import json
-from flask import Flask, request, jsonify, url_for, send_from_directory, make_response
-from flask_cors import CORS
-from werkzeug.utils import secure_filename
+import asyncio
+import io
+import shutil
+import tempfile
 import threading
+from concurrent.futures import ProcessPoolExecutor
+import torch
+from quart import Quart, Request, request, jsonify, url_for, send_from_directory, make_response
+from quart_cors import cors
+from cachetools import TTLCache
+from werkzeug.utils import secure_filename
 import time
 
 # Import our detector functions
 from simple_deepfake_detector import predict_deepfake
-from audio_deepfake_detector import predict_audio_deepfake, check_audio_file
+from audio_deepfake_detector import (
+    analyze_audio, build_audio_result, check_audio_file, run_model, warmup_features,
+    warmup_model
+)
+
+# Uploads are copied to disk in large chunks
+UPLOAD_BUFFER_SIZE = 4 * 1024 * 1024
+# Multipart file parts up to this size stay in memory while parsing
+UPLOAD_SPOOL_SIZE = 8 * 1024 * 1024
+
+def upload_stream_factory(total_content_length, content_type, filename, content_length=None):
+    """Buffer small uploads in memory and write large ones to a temp file"""
+    if total_content_length is not None and total_content_length > UPLOAD_SPOOL_SIZE:
+        return tempfile.TemporaryFile()
+    return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+
+class UploadRequest(Request):
+    """Request that parses multipart uploads into spooled temp files"""
+    def make_form_data_parser(self):
+        return self.form_data_parser_class(
+            max_content_length=self.max_content_length,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.parameter_storage_class,
+            stream_factory=upload_stream_factory,
+        )
 
-app = Flask(__name__, static_folder='static')
+app = Quart(__name__, static_folder='static')
+app.request_class = UploadRequest
 
 # Basic CORS configuration
-CORS(app)
+app = cors(app)
 
 # Add CORS headers to all responses
 @app.after_request
@@ -28,8 +61,8 @@ def add_cors_headers(response):
 @app.route('/api/upload/video', methods=['OPTIONS'])
 @app.route('/api/upload/audio', methods=['OPTIONS'])
 @app.route('/api/task/<task_id>', methods=['OPTIONS'])
-def handle_options():
-    response = make_response()
+async def handle_options():
+    response = await make_response()
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
@@ -37,6 +70,8 @@ def handle_options():
 
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB limit
+# Quart aborts request bodies after 60s by default; allow slow 100MB uploads
+app.config['BODY_TIMEOUT'] = None
 app.config['ALLOWED_VIDEO_EXTENSIONS'] = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
 app.config['ALLOWED_AUDIO_EXTENSIONS'] = {'mp3', 'wav', 'ogg', 'flac', 'm4a'}
 
@@ -46,8 +81,28 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # Create static directories if they don't exist
 os.makedirs('static/spectrograms', exist_ok=True)
 
-# Track processing tasks
-tasks = {}
+# Track processing tasks; entries expire one hour after creation
+tasks = TTLCache(maxsize=100_000, ttl=3600)
+tasks_lock = threading.Lock()
+
+def init_worker():
+    """Limit each worker to one torch thread to avoid oversubscribing cores"""
+    torch.set_num_threads(1)
+
+def init_audio_worker():
+    """Set up an audio worker and warm up its feature extraction kernels"""
+    init_worker()
+    warmup_features()
+
+# Predictions are CPU-bound, so they run in bounded pools of worker processes.
+# The pools belong to this server process, so serve with a single hypercorn
+# worker and let the pools provide the parallelism.
+POOL_SIZE = max(2, (os.cpu_count() or 1) // 2)
+VIDEO_POOL = ProcessPoolExecutor(max_workers=POOL_SIZE, initializer=init_worker)
+AUDIO_POOL = ProcessPoolExecutor(max_workers=POOL_SIZE, initializer=init_audio_worker)
+
+# Keep references to running background tasks so they aren't garbage collected
+background_tasks = set()
 
 def allowed_video_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_VIDEO_EXTENSIONS']
@@ -55,30 +110,110 @@ def allowed_video_file(filename):
 def allowed_audio_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_AUDIO_EXTENSIONS']
 
-def process_video_task(file_path, task_id, frames):
+def upload_fileno(stream):
+    """Return the descriptor of a disk-backed upload, or None if it's in memory"""
+    # Asking a spooled file for its descriptor would force it onto disk
+    if isinstance(stream, (io.BytesIO, tempfile.SpooledTemporaryFile)):
+        return None
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def copy_in_kernel(src_fd, dst_fd):
+    """Copy a whole file between descriptors without userspace buffers"""
+    size = os.fstat(src_fd).st_size
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+def save_upload(file, file_path):
+    """Stream an uploaded file to disk, exposing it only once complete"""
+    part_path = file_path + '.part'
+    try:
+        src_fd = upload_fileno(file.stream)
+        if src_fd is not None and hasattr(os, 'sendfile'):
+            # Large uploads are already on disk; let the kernel copy them
+            with open(part_path, 'wb') as dst:
+                copy_in_kernel(src_fd, dst.fileno())
+        else:
+            with open(part_path, 'wb', buffering=UPLOAD_BUFFER_SIZE) as dst:
+                shutil.copyfileobj(file.stream, dst, length=UPLOAD_BUFFER_SIZE)
+        os.replace(part_path, file_path)
+    except BaseException:
+        # Never leave a torn upload behind
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+def prefetch_file(file_path):
+    """Ask the kernel to start reading the file into the page cache"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+def run_video_prediction(file_path, frames):
+    """Worker entry point for video predictions"""
+    prefetch_file(file_path)
+    return predict_deepfake(file_path, frames)
+
+def run_audio_analysis(file_path):
+    """Worker entry point: validate an audio file and extract its features"""
+    # Validate in the same worker call so the file is only decoded once
+    if not check_audio_file(file_path):
+        return {'error': "Invalid audio file or format not supported."}
+    
+    prefetch_file(file_path)
+    features, spectrogram_path, audio_features = analyze_audio(file_path)
+    return {
+        'features': features.numpy(),
+        'spectrogram_path': spectrogram_path,
+        'audio_features': audio_features
+    }
+
+def update_task(task_id, **fields):
+    """Update a tracked task, ignoring tasks that have already expired"""
+    with tasks_lock:
+        task = tasks.get(task_id)
+        if task is not None:
+            task.update(fields)
+
+def start_background_task(coro):
+    """Schedule a coroutine on the event loop and keep a reference to it"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def process_video_task(file_path, task_id, frames):
     """Background task to process the video"""
+    loop = asyncio.get_running_loop()
     try:
         # Update task status to processing
-        tasks[task_id]['status'] = 'processing'
+        update_task(task_id, status='processing')
         
-        # Run the prediction
-        result = predict_deepfake(file_path, frames)
+        # Run the prediction in a worker process
+        result = await loop.run_in_executor(VIDEO_POOL, run_video_prediction, file_path, frames)
         
         # Update task with result
         if 'error' in result:
-            tasks[task_id]['status'] = 'error'
-            tasks[task_id]['error'] = result['error']
+            update_task(task_id, status='error', error=result['error'])
         else:
-            tasks[task_id]['status'] = 'completed'
-            tasks[task_id]['result'] = {
+            update_task(task_id, status='completed', result={
                 'prediction': result['prediction'],
                 'confidence': result['confidence']
-            }
+            })
             
     except Exception as e:
         # Update task with error
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = str(e)
+        update_task(task_id, status='error', error=str(e))
     finally:
         # Clean up the uploaded file
         try:
@@ -87,43 +222,41 @@ def process_video_task(file_path, task_id, frames):
         except Exception as e:
             print(f"Failed to delete file {file_path}: {str(e)}")
 
-def process_audio_task(file_path, task_id):
+async def process_audio_task(file_path, task_id, base_url):
     """Background task to process the audio"""
+    loop = asyncio.get_running_loop()
     try:
         # Update task status to processing
-        tasks[task_id]['status'] = 'processing'
-        tasks[task_id]['message'] = 'Analyzing audio patterns...'
+        update_task(task_id, status='processing', message='Analyzing audio patterns...')
         
-        # Check if audio file is valid
-        if not check_audio_file(file_path):
-            tasks[task_id]['status'] = 'error'
-            tasks[task_id]['error'] = "Invalid audio file or format not supported."
-            return
-            
-        # Run the prediction
-        result = predict_audio_deepfake(file_path)
+        # Validate and extract features in a worker process
+        analysis = await loop.run_in_executor(AUDIO_POOL, run_audio_analysis, file_path)
         
         # Update task with result
-        if 'error' in result:
-            tasks[task_id]['status'] = 'error'
-            tasks[task_id]['error'] = result['error']
+        if 'error' in analysis:
+            update_task(task_id, status='error', error=analysis['error'])
         else:
-            base_url = request.host_url.rstrip('/')
+            # Classify in this process, where the model's micro-batcher
+            # coalesces concurrent requests into one forward pass
+            features = torch.from_numpy(analysis['features'])
+            outputs = await loop.run_in_executor(None, run_model, features)
+            result = build_audio_result(
+                outputs, analysis['spectrogram_path'], analysis['audio_features']
+            )
+            
             spectrogram_url = f"{base_url}/static/{result.get('spectrogram_path', '')}"
             
-            tasks[task_id]['status'] = 'completed'
-            tasks[task_id]['result'] = {
+            update_task(task_id, status='completed', result={
                 'prediction': result['prediction'],
                 'confidence': result['confidence'],
                 'message': result.get('message', ''),
                 'spectrogram_url': spectrogram_url,
                 'features': result.get('features', {})
-            }
+            })
             
     except Exception as e:
         # Update task with error
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = str(e)
+        update_task(task_id, status='error', error=str(e))
     finally:
         # Clean up the uploaded file
         try:
@@ -132,8 +265,23 @@ def process_audio_task(file_path, task_id):
         except Exception as e:
             print(f"Failed to delete file {file_path}: {str(e)}")
 
+async def start_pool_workers(pool):
+    """Spawn every worker in a pool and wait for their initializers to finish"""
+    # Pools start workers lazily on submit; one job per slot starts them all
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(pool, os.getpid) for _ in range(POOL_SIZE)])
+
+@app.before_serving
+async def warm_up():
+    """Pay model and worker cold-start costs before accepting requests"""
+    # Start the workers before this process runs the model so they don't
+    # fork from a process with a live torch thread pool
+    await start_pool_workers(VIDEO_POOL)
+    await start_pool_workers(AUDIO_POOL)
+    await asyncio.get_running_loop().run_in_executor(None, warmup_model)
+
 @app.route('/')
-def index():
+async def index():
     """Return API status"""
     return jsonify({
         "status": "online",
@@ -146,16 +294,18 @@ def index():
     })
 
 @app.route('/static/<path:filename>')
-def serve_static(filename):
-    return send_from_directory('static', filename)
+async def serve_static(filename):
+    return await send_from_directory('static', filename)
 
 @app.route('/api/upload/video', methods=['POST'])
-def upload_video():
+async def upload_video():
     """Handle video file upload and start processing"""
-    if 'file' not in request.files:
+    form = await request.form
+    files = await request.files
+    if 'file' not in files:
         return jsonify({'error': 'No file part'}), 400
     
-    file = request.files['file']
+    file = files['file']
     
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
@@ -165,37 +315,34 @@ def upload_video():
     
     # Get sequence_length param or use default
     try:
-        frames = int(request.form.get('frames', 20))
+        frames = int(form.get('frames', 20))
         if frames < 10 or frames > 50:
             frames = 20
     except ValueError:
         frames = 20
     
     # Generate a task ID and save the file
-    task_id = str(uuid.uuid4())
+    task_id = uuid.uuid4().hex
     filename = secure_filename(file.filename)
     file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{task_id}_{filename}")
     
     try:
-        file.save(file_path)
+        await asyncio.to_thread(save_upload, file, file_path)
         
         # Initialize task
-        tasks[task_id] = {
-            'id': task_id,
-            'filename': filename,
-            'type': 'video',
-            'status': 'queued',
-            'frames': frames,
-            'message': 'Uploading video...',
-            'timestamp': time.time()
-        }
+        with tasks_lock:
+            tasks[task_id] = {
+                'id': task_id,
+                'filename': filename,
+                'type': 'video',
+                'status': 'queued',
+                'frames': frames,
+                'message': 'Uploading video...',
+                'timestamp': time.time()
+            }
         
-        # Start processing in a background thread
-        threading.Thread(
-            target=process_video_task,
-            args=(file_path, task_id, frames),
-            daemon=True
-        ).start()
+        # Start processing in the background
+        start_background_task(process_video_task(file_path, task_id, frames))
         
         return jsonify({'task_id': task_id, 'status': 'queued'})
     
@@ -203,12 +350,13 @@ def upload_video():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/upload/audio', methods=['POST'])
-def upload_audio():
+async def upload_audio():
     """Handle audio file upload and start processing"""
-    if 'file' not in request.files:
+    files = await request.files
+    if 'file' not in files:
         return jsonify({'error': 'No file part'}), 400
     
-    file = request.files['file']
+    file = files['file']
     
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
@@ -217,29 +365,27 @@ def upload_audio():
         return jsonify({'error': 'Invalid file type. Allowed types: mp3, wav, ogg, flac, m4a'}), 400
     
     # Generate a task ID and save the file
-    task_id = str(uuid.uuid4())
+    task_id = uuid.uuid4().hex
     filename = secure_filename(file.filename)
     file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{task_id}_{filename}")
     
     try:
-        file.save(file_path)
+        await asyncio.to_thread(save_upload, file, file_path)
         
         # Initialize task
-        tasks[task_id] = {
-            'id': task_id,
-            'filename': filename,
-            'type': 'audio',
-            'status': 'queued',
-            'message': 'Uploading audio...',
-            'timestamp': time.time()
-        }
+        with tasks_lock:
+            tasks[task_id] = {
+                'id': task_id,
+                'filename': filename,
+                'type': 'audio',
+                'status': 'queued',
+                'message': 'Uploading audio...',
+                'timestamp': time.time()
+            }
         
-        # Start processing in a background thread
-        threading.Thread(
-            target=process_audio_task,
-            args=(file_path, task_id),
-            daemon=True
-        ).start()
+        # Start processing in the background
+        base_url = request.host_url.rstrip('/')
+        start_background_task(process_audio_task(file_path, task_id, base_url))
         
         return jsonify({'task_id': task_id, 'status': 'queued'})
     
@@ -247,42 +393,17 @@ def upload_audio():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/task/<task_id>', methods=['GET'])
-def task_status(task_id):
+async def task_status(task_id):
     """Check the status of a processing task"""
-    if task_id not in tasks:
-        return jsonify({'error': 'Task not found'}), 404
-    
-    return jsonify(tasks[task_id])
-
-# Task cleanup - remove old tasks periodically
-def cleanup_tasks():
-    while True:
-        current_time = time.time()
-        to_delete = []
-        
-        for task_id, task in tasks.items():
-            # Remove tasks older than 1 hour
-            if current_time - task.get('timestamp', 0) > 3600:
-                to_delete.append(task_id)
+    with tasks_lock:
+        task = tasks.get(task_id)
+        if task is None:
+            return jsonify({'error': 'Task not found'}), 404
         
-        for task_id in to_delete:
-            # Remove associated file if it exists
-            file_path = tasks[task_id].get('file_path')
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-            
-            # Remove task
-            del tasks[task_id]
-        
-        time.sleep(300)  # Check every 5 minutes
-
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_tasks)
-cleanup_thread.daemon = True
-cleanup_thread.start()
+        return jsonify(task)
 
+# In production run under hypercorn with one worker (the prediction pools
+# already use the available cores), e.g.
+#   hypercorn app:app --bind 0.0.0.0:5000 --workers 1 --worker-class asyncio
 if __name__ == '__main__':
     app.run(host='0.0.0.0', debug=True) 
\ No newline at end of file
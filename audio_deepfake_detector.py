@@ -1,25 +1,65 @@
 import os
 import numpy as np
 import librosa
+import soundfile as sf
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+import torch.ao.quantization as tq
+import torchaudio.functional as AF
+import torchaudio.transforms as T
 from scipy import signal
-import matplotlib.pyplot as plt
-import uuid
+from matplotlib import cm
+from PIL import Image
+import itertools
 import time
+import random
+import threading
+import queue
+import warnings
+from typing import Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Audio analysis parameters
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 13
+
+# Shared transforms, configured to match librosa's defaults
+_MEL_SPECTROGRAM = T.MelSpectrogram(
+    sample_rate=SAMPLE_RATE,
+    n_fft=N_FFT,
+    hop_length=HOP_LENGTH,
+    n_mels=N_MELS,
+    pad_mode='constant',
+    norm='slaney',
+    mel_scale='slaney'
+)
+_AMPLITUDE_TO_DB = T.AmplitudeToDB(stype='power', top_db=80)
+_DCT_MATRIX = AF.create_dct(N_MFCC, N_MELS, norm='ortho')
+_WINDOW = torch.hann_window(N_FFT)
+_FFT_FREQS = torch.linspace(0, SAMPLE_RATE / 2, N_FFT // 2 + 1)
 
 class AudioDeepfakeDetector(nn.Module):
     """Simple neural network for audio deepfake detection"""
     def __init__(self):
         super(AudioDeepfakeDetector, self).__init__()
+        # Quantization boundaries (no-ops until the model is quantized)
+        self.quant = tq.QuantStub()
+        self.dequant = tq.DeQuantStub()
+        
         # CNN layers for spectrogram analysis
         self.conv1 = nn.Conv2d(1, 32, kernel_size=3, stride=1, padding=1)
         self.bn1 = nn.BatchNorm2d(32)
+        self.relu1 = nn.ReLU()
         self.conv2 = nn.Conv2d(32, 64, kernel_size=3, stride=1, padding=1)
         self.bn2 = nn.BatchNorm2d(64)
+        self.relu2 = nn.ReLU()
         self.conv3 = nn.Conv2d(64, 128, kernel_size=3, stride=1, padding=1)
         self.bn3 = nn.BatchNorm2d(128)
+        self.relu3 = nn.ReLU()
         
         # Fully connected layers
         self.fc1 = nn.Linear(128 * 16 * 16, 512)
@@ -27,147 +67,377 @@ class AudioDeepfakeDetector(nn.Module):
         self.fc2 = nn.Linear(512, 2)  # 2 outputs: real or fake
         
     def forward(self, x):
+        x = self.quant(x)
+        
         # CNN layers with max pooling
-        x = F.relu(self.bn1(self.conv1(x)))
+        x = self.relu1(self.bn1(self.conv1(x)))
         x = F.max_pool2d(x, 2)
-        x = F.relu(self.bn2(self.conv2(x)))
+        x = self.relu2(self.bn2(self.conv2(x)))
         x = F.max_pool2d(x, 2)
-        x = F.relu(self.bn3(self.conv3(x)))
+        x = self.relu3(self.bn3(self.conv3(x)))
         x = F.max_pool2d(x, 2)
         
         # Flatten and feed to fully connected layers
-        x = x.view(-1, 128 * 16 * 16)
+        x = x.reshape(-1, 128 * 16 * 16)
         x = F.relu(self.fc1(x))
         x = self.dropout(x)
         x = self.fc2(x)
         
-        return x
+        return self.dequant(x)
 
 def create_audio_model():
     """Create and return the audio model instance"""
     model = AudioDeepfakeDetector()
     return model
 
+def quantize_audio_model(model, calibration_batches=8):
+    """Convert the model to int8 with post-training static quantization"""
+    model.eval()
+    
+    # Fold batch norm into the convolutions and fuse the ReLUs
+    tq.fuse_modules(
+        model,
+        [['conv1', 'bn1', 'relu1'], ['conv2', 'bn2', 'relu2'], ['conv3', 'bn3', 'relu3']],
+        inplace=True
+    )
+    
+    model.qconfig = tq.get_default_qconfig(torch.backends.quantized.engine)
+    tq.prepare(model, inplace=True)
+    
+    # Calibrate activation ranges; inputs are normalized spectrograms.
+    # With no calibration the quantization parameters are expected to be
+    # loaded from a saved state dict afterwards.
+    with torch.inference_mode():
+        for _ in range(calibration_batches):
+            model(torch.randn(4, 1, 128, 128))
+    
+    with warnings.catch_warnings():
+        if calibration_batches == 0:
+            warnings.filterwarnings('ignore', message='must run observer')
+        tq.convert(model, inplace=True)
+    return model
+
+# Quantized parameters are saved on first start and reloaded afterwards
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+def quantized_model_path():
+    """Location of the saved int8 state dict for the active quantized engine"""
+    engine = torch.backends.quantized.engine
+    return os.path.join(MODEL_DIR, f'audio_deepfake_detector_int8_{engine}.pt')
+
+def load_quantized_model():
+    """Build the scripted int8 model, reusing saved quantized parameters if compatible"""
+    path = quantized_model_path()
+    if os.path.exists(path):
+        model = quantize_audio_model(create_audio_model(), calibration_batches=0)
+        try:
+            model.load_state_dict(torch.load(path))
+            return torch.jit.script(model)
+        except Exception as e:
+            print(f"Ignoring incompatible quantized weights {path}: {str(e)}")
+    
+    model = quantize_audio_model(create_audio_model())
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    # Workers may build the model concurrently; publish it atomically
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    return torch.jit.script(model)
+
+# Process-wide model instance, built once and shared by all requests.
+# The device is chosen on first use so CUDA is never touched before a fork.
+_MODEL = None
+_DEVICE = None
+_MODEL_LOCK = threading.Lock()
+
+def get_model():
+    """Return the shared audio model, building it on first use"""
+    global _MODEL, _DEVICE
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                _DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+                if _DEVICE.type == 'cuda':
+                    # Quantized kernels are CPU-only; run the float model with autocast
+                    model = create_audio_model().to(_DEVICE)
+                else:
+                    model = load_quantized_model()
+                _MODEL = model.eval()
+    return _MODEL
+
+# Concurrent predictions are coalesced into batches for a single forward pass
+MAX_BATCH_SIZE = 16
+
+_INFER_QUEUE = queue.Queue()
+_BATCHER_THREAD = None
+_BATCHER_LOCK = threading.Lock()
+
+def _batch_worker():
+    """Run queued feature tensors through the model in batches"""
+    while True:
+        items = [_INFER_QUEUE.get()]
+        # Only take requests that are already waiting; never delay a lone one
+        while len(items) < MAX_BATCH_SIZE:
+            try:
+                items.append(_INFER_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        
+        try:
+            model = get_model()
+            batch = torch.cat([features for features, _ in items])
+            with torch.inference_mode():
+                if _DEVICE.type == 'cuda':
+                    batch = batch.pin_memory().to(_DEVICE, non_blocking=True)
+                    with torch.autocast(device_type='cuda', dtype=torch.float16):
+                        outputs = model(batch)
+                    outputs = outputs.float().cpu()
+                else:
+                    outputs = model(batch)
+            for (_, future), output in zip(items, outputs.split(1)):
+                future.set_result(output)
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+
+def _reset_batcher():
+    """Forget the batcher thread, which does not survive a fork"""
+    global _INFER_QUEUE, _BATCHER_THREAD, _BATCHER_LOCK
+    _INFER_QUEUE = queue.Queue()
+    _BATCHER_THREAD = None
+    _BATCHER_LOCK = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_batcher)
+
+def run_model(features):
+    """Queue a (1, 1, 128, 128) feature batch and wait for its model output"""
+    global _BATCHER_THREAD
+    if _BATCHER_THREAD is None:
+        with _BATCHER_LOCK:
+            if _BATCHER_THREAD is None:
+                _BATCHER_THREAD = threading.Thread(target=_batch_worker, daemon=True)
+                _BATCHER_THREAD.start()
+    
+    future = Future()
+    _INFER_QUEUE.put((features, future))
+    return future.result()
+
+# Spectrogram images are rendered in the background, off the request path.
+# Rendering only uses the colormap and PIL (no pyplot state), so threads are safe.
+_PNG_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Spectrogram file names: process ID and start time plus an in-process counter
+_PNG_COUNTER = itertools.count()
+_PNG_PREFIX = f"{os.getpid()}_{int(time.time())}"
+
+def _reset_png_counter():
+    """Give a forked child its own file name prefix"""
+    global _PNG_COUNTER, _PNG_PREFIX
+    _PNG_COUNTER = itertools.count()
+    _PNG_PREFIX = f"{os.getpid()}_{int(time.time())}"
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_png_counter)
+
+# 256-entry RGB lookup table for the viridis colormap
+_VIRIDIS = (cm.viridis(np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+SPECTROGRAM_IMAGE_SIZE = (1000, 400)
+
+def _render_spectrogram_png(mel_spec, filepath):
+    """Render a spectrogram as a viridis-colored PNG"""
+    # Map values to colormap indices and flip so low frequencies are at the bottom
+    lo, hi = mel_spec.min(), mel_spec.max()
+    idx = ((mel_spec[::-1] - lo) * (255.0 / (hi - lo + 1e-9))).astype(np.uint8)
+    image = Image.fromarray(_VIRIDIS[idx]).resize(SPECTROGRAM_IMAGE_SIZE, Image.BILINEAR)
+    image.save(filepath, 'PNG', optimize=False, compress_level=1)
+
 def save_spectrogram(mel_spec, filename):
     """Save spectrogram visualization to file"""
-    plt.figure(figsize=(10, 4))
-    plt.imshow(mel_spec, aspect='auto', origin='lower', cmap='viridis')
-    plt.colorbar(format='%+2.0f dB')
-    plt.title('Mel-Spectrogram')
-    plt.tight_layout()
-    
     # Create static directory if it doesn't exist
     os.makedirs('static/spectrograms', exist_ok=True)
     
-    # Save figure
+    # Render in the background; the image appears shortly after
     filepath = os.path.join('static/spectrograms', filename)
-    plt.savefig(filepath, dpi=150)
-    plt.close()
+    _PNG_POOL.submit(_render_spectrogram_png, mel_spec, filepath)
     
     # Return the path relative to static directory
     return f'spectrograms/{filename}'
 
-def extract_audio_features(audio_path):
+def load_audio(audio_path, sr=SAMPLE_RATE):
+    """Decode an audio file into a mono float32 waveform tensor"""
+    try:
+        # Decode directly with libsndfile, then downmix and resample
+        y, native_sr = sf.read(audio_path, dtype='float32', always_2d=True)
+        y = y.mean(axis=1)
+        if native_sr != sr:
+            y = librosa.resample(y, orig_sr=native_sr, target_sr=sr)
+    except RuntimeError:
+        # Formats libsndfile can't read (e.g. m4a) go through librosa's fallbacks
+        y, _ = librosa.load(audio_path, sr=sr)
+    return torch.from_numpy(np.ascontiguousarray(y, dtype=np.float32))
+
+@torch.jit.script
+def _spectral_features(
+    y: torch.Tensor,
+    window: torch.Tensor,
+    freqs: torch.Tensor,
+    mel_fb: torch.Tensor,
+    dct: torch.Tensor,
+    n_fft: int,
+    hop_length: int
+) -> Dict[str, torch.Tensor]:
+    """Compute frame-averaged spectral features from a single STFT"""
+    magnitude = torch.stft(
+        y,
+        n_fft,
+        hop_length=hop_length,
+        window=window,
+        pad_mode='constant',
+        return_complex=True
+    ).abs()
+    
+    # Spectral centroid: magnitude-weighted mean frequency of each frame
+    centroid = (magnitude * freqs[:, None]).sum(0) / magnitude.sum(0).clamp_min(1e-10)
+    
+    # Spectral rolloff: frequency below which 85% of each frame's energy lies
+    cumulative = magnitude.cumsum(0)
+    rolloff = freqs[(cumulative >= 0.85 * cumulative[-1:]).int().argmax(0)]
+    
+    # MFCCs from the log mel power spectrogram (same dB scaling as librosa)
+    mel = torch.matmul((magnitude ** 2).T, mel_fb)
+    log_mel = 10.0 * torch.log10(mel.clamp_min(1e-10))
+    log_mel = torch.maximum(log_mel, log_mel.max() - 80.0)
+    mfccs = torch.matmul(log_mel, dct)
+    
+    # Zero-crossing rate per centered frame, as librosa frames it: edge padding,
+    # and values within 1e-10 of zero count as zero with a positive sign
+    padded = F.pad(y[None, None], (n_fft // 2, n_fft // 2), mode='replicate')[0, 0]
+    negative = padded.unfold(0, n_fft, hop_length) < -1e-10
+    zcr = (negative[:, 1:] != negative[:, :-1]).float().sum(1) / n_fft
+    
+    return {
+        'zero_crossing_rate': zcr.mean(),
+        'spectral_centroid': centroid.mean(),
+        'spectral_rolloff': rolloff.mean(),
+        'mfccs': mfccs.mean(0)
+    }
+
+def extract_audio_features(y, sr=SAMPLE_RATE):
     """Extract various audio features that might indicate manipulation"""
-    y, sr = librosa.load(audio_path, sr=22050)
+    spectral = _spectral_features(
+        y, _WINDOW, _FFT_FREQS, _MEL_SPECTROGRAM.mel_scale.fb, _DCT_MATRIX, N_FFT, HOP_LENGTH
+    )
     
     # Calculate features
     features = {
-        'zero_crossing_rate': np.mean(librosa.feature.zero_crossing_rate(y)),
-        'spectral_centroid': np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)),
-        'spectral_rolloff': np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr)),
-        'mfccs': np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13), axis=1).tolist(),
-        'length': len(y) / sr  # Length in seconds
+        'zero_crossing_rate': spectral['zero_crossing_rate'].item(),
+        'spectral_centroid': spectral['spectral_centroid'].item(),
+        'spectral_rolloff': spectral['spectral_rolloff'].item(),
+        'mfccs': spectral['mfccs'].tolist(),
+        'length': y.numel() / sr  # Length in seconds
     }
     
     return features
 
-def extract_features(audio_path, duration=5, sr=22050):
-    """Extract mel-spectrogram features from an audio file"""
+# Per-thread scratch buffer for zero-padding short clips
+_PAD_BUFFER = threading.local()
+
+def extract_features(y, duration=5, sr=SAMPLE_RATE):
+    """Extract mel-spectrogram features from an audio waveform"""
     try:
-        # Load audio file (taking first 'duration' seconds)
-        y, sr = librosa.load(audio_path, sr=sr, duration=duration)
+        # Take the first 'duration' seconds of audio
+        num_samples = sr * duration
+        y = y[:num_samples]
         
         # If audio is shorter than expected duration, pad with zeros
-        if len(y) < sr * duration:
-            y = np.pad(y, (0, sr * duration - len(y)))
+        # by copying into a reusable per-thread buffer
+        if y.numel() < num_samples:
+            buf = getattr(_PAD_BUFFER, 'buf', None)
+            if buf is None or buf.numel() != num_samples:
+                buf = torch.zeros(num_samples)
+                _PAD_BUFFER.buf = buf
+            buf[:y.numel()] = y
+            buf[y.numel():] = 0
+            y = buf
         
-        # Create mel-spectrogram
-        mel_spectrogram = librosa.feature.melspectrogram(
-            y=y, 
-            sr=sr, 
-            n_mels=128,
-            n_fft=2048,
-            hop_length=512
-        )
-        
-        # Convert to log scale
-        log_mel_spectrogram = librosa.power_to_db(mel_spectrogram)
+        # Create log-scaled mel-spectrogram
+        log_mel_spectrogram = _AMPLITUDE_TO_DB(_MEL_SPECTROGRAM(y))
         
         # Save the spectrogram visualization
-        filename = f"spectrogram_{uuid.uuid4()}.png"
-        spectrogram_path = save_spectrogram(log_mel_spectrogram, filename)
+        filename = f"spectrogram_{_PNG_PREFIX}_{next(_PNG_COUNTER)}.png"
+        spectrogram_path = save_spectrogram(log_mel_spectrogram.numpy(), filename)
         
         # Normalize
         log_mel_spectrogram = (log_mel_spectrogram - log_mel_spectrogram.mean()) / log_mel_spectrogram.std()
         
-        # Resize to expected input size (1, 128, 128)
-        from skimage.transform import resize
-        log_mel_spectrogram = resize(log_mel_spectrogram, (128, 128), anti_aliasing=True)
-        
-        # Add channel dimension and convert to torch tensor
-        features = torch.tensor(log_mel_spectrogram[np.newaxis, :, :], dtype=torch.float32)
+        # Resize to expected input size (1, 1, 128, 128), adding batch and channel dimensions
+        features = F.interpolate(
+            log_mel_spectrogram[None, None],
+            size=(128, 128),
+            mode='bilinear',
+            align_corners=False,
+            antialias=True
+        ).to(torch.float32)
         
         return features, spectrogram_path
     
     except Exception as e:
         raise ValueError(f"Error extracting features: {str(e)}")
 
-def predict_audio_deepfake(audio_path):
-    """Predict if an audio file contains a deepfake"""
-    # Use CPU for compatibility
-    device = torch.device("cpu")
+def warmup_model():
+    """Build the model and run silent input through it"""
+    # Two passes let TorchScript's profiling executor settle on an optimized graph
+    for _ in range(2):
+        run_model(torch.zeros(1, 1, 128, 128))
+
+def warmup_features():
+    """Run silent input through the FFT, mel and feature kernels"""
+    y = torch.zeros(SAMPLE_RATE)
+    _MEL_SPECTROGRAM(y)
+    extract_audio_features(y)
+
+def analyze_audio(audio_path):
+    """Decode an audio file and extract the model input and reported features"""
+    # Decode the audio once and share it between the extractors
+    y = load_audio(audio_path)
     
-    # Create and load model
-    model = create_audio_model().to(device)
+    # Extract features and get spectrogram path
+    features, spectrogram_path = extract_features(y)
     
-    # Set to evaluation mode
-    model.eval()
+    # Extract additional audio features
+    audio_features = extract_audio_features(y)
+    
+    return features, spectrogram_path, audio_features
+
+def build_audio_result(outputs, spectrogram_path, audio_features):
+    """Turn the model output for one clip into a prediction result"""
+    with torch.inference_mode():
+        probabilities = torch.softmax(outputs, dim=1)
+        prediction = torch.argmax(probabilities, dim=1).item()
+        confidence = probabilities[0][prediction].item() * 100
+    
+    # Convert MFCCs to make it JSON serializable
+    if 'mfccs' in audio_features:
+        audio_features['mfccs'] = [float(x) for x in audio_features['mfccs']]
     
+    return {
+        'prediction': 'FAKE' if prediction == 1 else 'REAL',
+        'confidence': confidence,
+        'spectrogram_path': spectrogram_path,
+        'features': audio_features,
+        'message': generate_explanation(prediction, audio_features)
+    }
+
+def predict_audio_deepfake(audio_path):
+    """Predict if an audio file contains a deepfake"""
     try:
-        # Extract features and get spectrogram path
-        features, spectrogram_path = extract_features(audio_path)
-        features = features.unsqueeze(0).to(device)  # Add batch dimension
+        features, spectrogram_path, audio_features = analyze_audio(audio_path)
         
-        # Extract additional audio features
-        audio_features = extract_audio_features(audio_path)
+        # Make prediction (batched with any concurrent requests, on GPU if available)
+        outputs = run_model(features)
         
-        # Make prediction
-        with torch.no_grad():
-            outputs = model(features)
-            probabilities = torch.softmax(outputs, dim=1)
-            prediction = torch.argmax(probabilities, dim=1).item()
-            confidence = probabilities[0][prediction].item() * 100
-            
-            # For demonstration, let's set a threshold for random prediction
-            # In a real system, this would be based on actual model predictions
-            import random
-            prediction = random.randint(0, 1)  # 0 for REAL, 1 for FAKE
-            confidence = random.uniform(70, 95)  # Random confidence between 70-95%
-            
-            # Convert MFCCs to make it JSON serializable
-            if 'mfccs' in audio_features:
-                audio_features['mfccs'] = [float(x) for x in audio_features['mfccs']]
-            
-            result = {
-                'prediction': 'FAKE' if prediction == 1 else 'REAL',
-                'confidence': confidence,
-                'spectrogram_path': spectrogram_path,
-                'features': audio_features,
-                'message': generate_explanation(prediction, audio_features)
-            }
-            
-            return result
+        return build_audio_result(outputs, spectrogram_path, audio_features)
     except Exception as e:
         print(f"Error during audio prediction: {str(e)}")
         return {'error': str(e)}
@@ -183,13 +453,19 @@ def generate_explanation(prediction, features):
             "Found inconsistencies in the audio signal that suggest manipulation.",
             "Detected abnormal spectral changes typical of AI-generated speech."
         ]
-        import random
         return random.choice(explanations)
 
 def check_audio_file(file_path):
     """Check if the audio file can be processed"""
     try:
-        # Attempt to load audio to verify it's a valid file
+        # Reading the header is enough for formats libsndfile supports
+        sf.info(file_path)
+        return True
+    except Exception:
+        pass
+    
+    try:
+        # Otherwise attempt to load audio to verify it's a valid file
         y, sr = librosa.load(file_path, sr=22050, duration=1)
         return True
     except Exception as e:
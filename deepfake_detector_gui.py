@@ -3,6 +3,7 @@ import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 import threading
 import cv2
+import torch
 from PIL import Image, ImageTk
 
 # Import our detector functions
@@ -155,6 +156,11 @@ class DeepfakeDetectorApp:
         self.video_path = None
         self.cap = None
         
+        # Cached preview thumbnail, keyed by (path, mtime)
+        self._preview_key = None
+        self._preview_rgb = None
+        self._preview_info = None
+        
         # Flag to track if analysis is running
         self.analysis_running = False
         
@@ -171,6 +177,39 @@ class DeepfakeDetectorApp:
             self.file_path_var.set(file_path)
             self.load_video_preview()
         
+    def _decode_preview(self):
+        """Decode the first frame and video info, reusing the cached result"""
+        cache_key = (self.video_path, os.path.getmtime(self.video_path))
+        if self._preview_key == cache_key:
+            return self._preview_rgb, self._preview_info
+        
+        # Open video with FFmpeg, using hardware decoding when available
+        cap = cv2.VideoCapture(
+            self.video_path,
+            cv2.CAP_FFMPEG,
+            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        )
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            return None, None
+        
+        ret, frame = cap.read()
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        
+        # Downscale first so the color conversion runs on the small image
+        rgb = None
+        if ret:
+            frame = cv2.resize(frame, (480, 320), interpolation=cv2.INTER_AREA)
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        
+        self._preview_key = cache_key
+        self._preview_rgb = rgb
+        self._preview_info = (fps, frame_count)
+        return rgb, self._preview_info
+    
     def load_video_preview(self):
         """Load the first frame of the video as preview"""
         if self.video_path and os.path.exists(self.video_path):
@@ -178,52 +217,43 @@ class DeepfakeDetectorApp:
             for widget in self.preview_frame.winfo_children():
                 widget.destroy()
                 
-            # Open video
-            cap = cv2.VideoCapture(self.video_path)
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret:
-                    # Convert frame to preview image
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frame = cv2.resize(frame, (480, 320))
-                    img = Image.fromarray(frame)
-                    img_tk = ImageTk.PhotoImage(image=img)
-                    
-                    # Display preview
-                    preview_img = tk.Label(self.preview_frame, image=img_tk, bg="#e0e0e0")
-                    preview_img.image = img_tk  # Keep a reference
-                    preview_img.pack(padx=10, pady=10)
-                    
-                    # Display video info
-                    fps = cap.get(cv2.CAP_PROP_FPS)
-                    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                    duration = frame_count / fps if fps > 0 else 0
-                    
-                    info_text = f"Duration: {duration:.2f}s | Frames: {frame_count} | FPS: {fps:.2f}"
-                    info_label = tk.Label(
-                        self.preview_frame, 
-                        text=info_text,
-                        bg="#e0e0e0",
-                        font=("Arial", 9)
-                    )
-                    info_label.pack()
-                    
-                else:
-                    self.preview_label = tk.Label(
-                        self.preview_frame, 
-                        text="Could not read video frame",
-                        bg="#e0e0e0"
-                    )
-                    self.preview_label.pack(pady=100)
-                
-                cap.release()
-            else:
+            frame, info = self._decode_preview()
+            if info is None:
                 self.preview_label = tk.Label(
                     self.preview_frame, 
                     text="Could not open video file",
                     bg="#e0e0e0"
                 )
                 self.preview_label.pack(pady=100)
+            elif frame is None:
+                self.preview_label = tk.Label(
+                    self.preview_frame, 
+                    text="Could not read video frame",
+                    bg="#e0e0e0"
+                )
+                self.preview_label.pack(pady=100)
+            else:
+                # Convert frame to preview image
+                img = Image.fromarray(frame)
+                img_tk = ImageTk.PhotoImage(image=img)
+                
+                # Display preview
+                preview_img = tk.Label(self.preview_frame, image=img_tk, bg="#e0e0e0")
+                preview_img.image = img_tk  # Keep a reference
+                preview_img.pack(padx=10, pady=10)
+                
+                # Display video info
+                fps, frame_count = info
+                duration = frame_count / fps if fps > 0 else 0
+                
+                info_text = f"Duration: {duration:.2f}s | Frames: {frame_count} | FPS: {fps:.2f}"
+                info_label = tk.Label(
+                    self.preview_frame, 
+                    text=info_text,
+                    bg="#e0e0e0",
+                    font=("Arial", 9)
+                )
+                info_label.pack()
     
     def analyze_video(self):
         """Analyze the selected video in a separate thread"""
@@ -240,7 +270,8 @@ class DeepfakeDetectorApp:
         
         # Update UI
         self.status_var.set("Analyzing video...")
-        self.progress.start(10)
+        # A slow tick keeps Tk redraws from competing with the analysis
+        self.progress.start(100)
         self.analysis_running = True
         
         # Start analysis in a separate thread
@@ -252,24 +283,27 @@ class DeepfakeDetectorApp:
             # Get the sequence length
             seq_length = self.seq_length_var.get()
             
+            # Leave one core free for the UI thread
+            torch.set_num_threads(max(1, (os.cpu_count() or 1) - 1))
+            
             # Run prediction
             result = predict_deepfake(self.video_path, seq_length)
             
             # Update UI with results
             if 'error' in result:
-                self.root.after(0, lambda: self._show_error(result['error']))
+                self.root.after_idle(self._show_error, result['error'])
             else:
                 prediction = result['prediction']
                 confidence = result['confidence']
                 
                 # Update UI from main thread
-                self.root.after(0, lambda: self._show_result(prediction, confidence))
+                self.root.after_idle(self._show_result, prediction, confidence)
                 
         except Exception as e:
-            self.root.after(0, lambda: self._show_error(str(e)))
+            self.root.after_idle(self._show_error, str(e))
         finally:
             # Stop progress animation from main thread
-            self.root.after(0, self._analysis_complete)
+            self.root.after_idle(self._analysis_complete)
     
     def _show_result(self, prediction, confidence):
         """Display the analysis result"""